@@ -1,6 +1,12 @@
 # agent_host/main.py
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+import json
+import queue
+import re
 import time
 import logging
 import os
@@ -12,6 +18,15 @@ load_dotenv()
 # --- Configuration ---
 PAPER_SEARCH_SERVER_URL = os.getenv("PAPER_SEARCH_SERVER_URL", "http://127.0.0.1:8000")
 PDF_SUMMARIZE_SERVER_URL = os.getenv("PDF_SUMMARIZE_SERVER_URL", "http://127.0.0.1:8001")
+# Upper bound on concurrent summarize calls; also sizes the HTTP connection pool.
+MAX_CONCURRENT_SUMMARIES = 8
+# Matches the paper search server's per-batch query limit.
+MAX_BATCH_TOPICS = 10
+
+# A URL is treated as a PDF when its path ends in ".pdf" (optionally followed by a query string)
+PDF_RE = re.compile(r'\.pdf(\?|$)', re.I)
+# arXiv abstract pages, e.g. http://arxiv.org/abs/2401.01234v1
+ARXIV_ABS_RE = re.compile(r'^https?://(?:export\.)?arxiv\.org/abs/([^?#]+?)/?$', re.I)
 
 # --- Logging Setup ---
 # Configure logging to console
@@ -22,82 +37,184 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# --- URL Helpers ---
+def to_pdf_url(url: str) -> str:
+    """Maps arXiv abstract page URLs to their PDF URLs; other URLs are returned unchanged."""
+    match = ARXIV_ABS_RE.match(url or "")
+    if match:
+        return f"https://arxiv.org/pdf/{match.group(1)}.pdf"
+    return url
+
 # --- Tool Call Logging Function ---
 def log_tool_call(tool_name: str, args: dict, start_time: float, outcome: str, latency: float = None):
     """Logs details about a tool call."""
-    log_message = f"Tool Call: {tool_name}(args={args})"
-    if latency is not None:
-        log_message += f", Latency: {latency:.2f}s"
-    log_message += f", Outcome: {outcome}"
-    logger.info(log_message)
+    # %-style arguments defer formatting until the record is actually emitted.
+    if latency is None:
+        logger.info("Tool Call: %s(args=%s), Outcome: %s", tool_name, args, outcome)
+    else:
+        logger.info("Tool Call: %s(args=%s), Latency: %.2fs, Outcome: %s", tool_name, args, latency, outcome)
 
 class PaperScoutAgent:
+    def __init__(self):
+        # A single Session keeps connections to the MCP servers alive across calls,
+        # so only the first request to each server pays the TCP/TLS handshake.
+        self._session = requests.Session()
+        # Connection failures and transient status codes are retried with exponential
+        # backoff. POST is retried too (urllib3 skips it by default) since those failures
+        # happen before the server has done any work or are explicit "try again" answers.
+        # Read timeouts are not retried: a summarize call only sends headers after the PDF
+        # is downloaded and parsed, so a slow PDF would otherwise be re-fetched each time.
+        # Once retries are exhausted the last response is returned, so raise_for_status()
+        # still reports the HTTP error as before.
+        retry = Retry(
+            total=3,
+            read=False,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=MAX_CONCURRENT_SUMMARIES,
+            max_retries=retry
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def close(self):
+        """Releases the pooled HTTP connections."""
+        self._session.close()
+
     def search_papers(self, query: str, max_results: int = 5) -> list:
         """Calls the paper_search MCP server to find papers."""
         tool_name = "paper_search"
         args = {"query": query, "max_results": max_results}
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{PAPER_SEARCH_SERVER_URL}/search_papers",
                 json=args,
-                timeout=30 # Add a timeout for HTTP requests
+                # Covers one uncached arXiv query. The server sends all arXiv calls one at a
+                # time, so a search queued behind another client's batch can take longer.
+                timeout=30
             )
             response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
             papers = response.json()
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             log_tool_call(tool_name, args, start_time, "Success", latency)
             return papers
         except requests.exceptions.ConnectionError:
-            latency = time.time() - start_time
-            log_tool_call(tool_name, args, start_time, "Connection Failed", latency)
-            print(f"Error: Could not connect to Paper Search Server at {PAPER_SEARCH_SERVER_URL}.")
-            print("Please ensure the 'paper_search_server' is running.")
+            latency = time.perf_counter() - start_time
+            log_tool_call(tool_name, args, start_time,
+                          f"Connection Failed: is 'paper_search_server' running at {PAPER_SEARCH_SERVER_URL}?", latency)
             return []
         except requests.exceptions.RequestException as e:
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             log_tool_call(tool_name, args, start_time, f"Request Failed: {e}", latency)
-            print(f"Error calling Paper Search Server: {e}")
             return []
         except Exception as e:
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             log_tool_call(tool_name, args, start_time, f"Unexpected Error: {e}", latency)
-            print(f"An unexpected error occurred during paper search: {e}")
             return []
 
-    def summarize_pdf(self, pdf_url: str) -> str:
-        """Calls the pdf_summarize MCP server to summarize a PDF."""
-        tool_name = "pdf_summarize"
-        args = {"pdf_url": pdf_url}
-        start_time = time.time()
+    def search_papers_batch(self, queries: list[str], max_results: int = 5) -> list[dict]:
+        """
+        Calls the paper_search MCP server once to find papers for several queries.
+        Returns one {"papers", "error"} result per query, in query order.
+        """
+        tool_name = "paper_search_batch"
+        args = [{"query": query, "max_results": max_results} for query in queries]
+        start_time = time.perf_counter()
         try:
-            response = requests.post(
-                f"{PDF_SUMMARIZE_SERVER_URL}/summarize_pdf",
+            response = self._session.post(
+                f"{PAPER_SEARCH_SERVER_URL}/search_papers_batch",
                 json=args,
-                timeout=120 # PDF download and LLM can take longer
+                timeout=30 * len(queries) # The server sends uncached queries to arXiv one at a time
             )
             response.raise_for_status()
-            summary = response.json().get("summary", "No summary received.")
-            latency = time.time() - start_time
-            log_tool_call(tool_name, args, start_time, "Success", latency)
+            results = response.json()
+            latency = time.perf_counter() - start_time
+            failed = sum(1 for result in results if result.get("error"))
+            outcome = f"Partial Success: {failed}/{len(results)} queries failed" if failed else "Success"
+            log_tool_call(tool_name, args, start_time, outcome, latency)
+            return results
+        except requests.exceptions.ConnectionError:
+            latency = time.perf_counter() - start_time
+            log_tool_call(tool_name, args, start_time,
+                          f"Connection Failed: is 'paper_search_server' running at {PAPER_SEARCH_SERVER_URL}?", latency)
+            return [{"papers": [], "error": "Failed to connect to paper search service."} for _ in queries]
+        except requests.exceptions.RequestException as e:
+            latency = time.perf_counter() - start_time
+            log_tool_call(tool_name, args, start_time, f"Request Failed: {e}", latency)
+            return [{"papers": [], "error": f"Failed to search papers: {e}"} for _ in queries]
+        except Exception as e:
+            latency = time.perf_counter() - start_time
+            log_tool_call(tool_name, args, start_time, f"Unexpected Error: {e}", latency)
+            return [{"papers": [], "error": f"An unexpected error occurred during search: {e}"} for _ in queries]
+
+    def summarize_pdf(self, pdf_url: str, on_delta=None) -> str:
+        """
+        Calls the pdf_summarize MCP server to summarize a PDF.
+        The summary is streamed; on_delta, if given, is called with each chunk as it arrives.
+        """
+        tool_name = "pdf_summarize"
+        args = {"pdf_url": pdf_url}
+        start_time = time.perf_counter()
+        try:
+            with self._session.post(
+                f"{PDF_SUMMARIZE_SERVER_URL}/summarize_pdf_stream",
+                json=args,
+                timeout=120, # PDF download and LLM can take longer
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                parts = []
+                final_event = None
+                # chunk_size=None yields data as it arrives instead of waiting for a full buffer
+                for line in response.iter_lines(chunk_size=None):
+                    if not line.startswith(b"data: "):
+                        continue
+                    event = json.loads(line[len(b"data: "):])
+                    if "delta" in event:
+                        parts.append(event["delta"])
+                        if on_delta:
+                            on_delta(event["delta"])
+                    else:
+                        final_event = event
+                        break
+
+            latency = time.perf_counter() - start_time
+            if final_event is None or "error" in final_event:
+                error = final_event["error"] if final_event else "stream ended before the summary was complete"
+                log_tool_call(tool_name, args, start_time, f"Stream Failed: {error}", latency)
+                return f"Failed to summarize PDF: {error}"
+            summary = "".join(parts).strip() or "No summary received."
+            outcome = "Success (cache hit)" if final_event.get("cached") else "Success"
+            log_tool_call(tool_name, args, start_time, outcome, latency)
             return summary
         except requests.exceptions.ConnectionError:
-            latency = time.time() - start_time
-            log_tool_call(tool_name, args, start_time, "Connection Failed", latency)
-            print(f"Error: Could not connect to PDF Summarize Server at {PDF_SUMMARIZE_SERVER_URL}.")
-            print("Please ensure the 'pdf_summarize_server' is running.")
+            latency = time.perf_counter() - start_time
+            log_tool_call(tool_name, args, start_time,
+                          f"Connection Failed: is 'pdf_summarize_server' running at {PDF_SUMMARIZE_SERVER_URL}?", latency)
             return "Failed to connect to summarization service."
         except requests.exceptions.RequestException as e:
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             log_tool_call(tool_name, args, start_time, f"Request Failed: {e}", latency)
-            print(f"Error calling PDF Summarize Server: {e}")
             return f"Failed to summarize PDF: {e}"
         except Exception as e:
-            latency = time.time() - start_time
+            latency = time.perf_counter() - start_time
             log_tool_call(tool_name, args, start_time, f"Unexpected Error: {e}", latency)
-            print(f"An unexpected error occurred during PDF summarization: {e}")
             return f"An unexpected error occurred during summarization: {e}"
 
+    def _summarize_into(self, pdf_url: str, deltas: queue.Queue) -> str:
+        """Runs summarize_pdf, forwarding streamed chunks to deltas and ending with a None sentinel."""
+        try:
+            return self.summarize_pdf(pdf_url, on_delta=deltas.put)
+        finally:
+            deltas.put(None)
+
     def discover_and_summarize_papers(self, topic: str, num_papers: int = 3):
         """Orchestrates paper discovery and summarization."""
         print(f"\nAI Scout: Searching for recent papers on '{topic}'...")
@@ -109,7 +226,62 @@ class PaperScoutAgent:
             return
 
         print(f"AI Scout: Found {len(papers)} paper(s). Now summarizing...")
+        self._summarize_and_print(papers)
+
+    def discover_and_summarize_topics(self, topics: list[str], num_papers: int = 3):
+        """Orchestrates discovery for several topics with a single batched search, then summarizes each."""
+        print(f"\nAI Scout: Searching for recent papers on {len(topics)} topics...")
+
+        results = self.search_papers_batch(topics, num_papers)
+        papers_by_topic = [result.get("papers") or [] for result in results]
+
+        # Queue every topic's summaries up front, so later topics are already downloading
+        # and summarizing while earlier ones are being printed. The pool runs jobs in
+        # submission order, so the first topic still gets workers first.
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SUMMARIES) as executor:
+            # Shared across topics, so a paper returned for several topics is summarized once.
+            streams, futures, drained = {}, {}, set()
+            pdf_urls_by_topic = [self._submit_summaries(executor, papers, streams, futures) for papers in papers_by_topic]
+
+            for topic, result, papers, pdf_urls in zip(topics, results, papers_by_topic, pdf_urls_by_topic):
+                print(f"\n=== Topic: {topic} ===")
+                if result.get("error"):
+                    print(f"AI Scout: Search failed for this topic. {result['error']}")
+                    continue
+                if not papers:
+                    print("AI Scout: No papers found for this topic.")
+                    continue
+                print(f"AI Scout: Found {len(papers)} paper(s). Now summarizing...")
+                self._print_papers(papers, pdf_urls, streams, futures, drained)
 
+    def _summarize_and_print(self, papers: list):
+        """Summarizes the given papers concurrently and prints them in order."""
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SUMMARIES) as executor:
+            streams, futures = {}, {}
+            pdf_urls = self._submit_summaries(executor, papers, streams, futures)
+            self._print_papers(papers, pdf_urls, streams, futures, set())
+
+    def _submit_summaries(self, executor: ThreadPoolExecutor, papers: list, streams: dict, futures: dict) -> list:
+        """
+        Queues a streamed summary for every paper with a PDF URL not already in futures,
+        adding its chunk queue and future to streams and futures, keyed by PDF URL.
+        Returns the per-paper PDF URLs.
+        """
+        # Summaries are independent, I/O-bound calls, so request them all up front; papers beyond
+        # the pool size start as soon as a worker frees up, overlapping with the ones being printed.
+        pdf_urls = [to_pdf_url(paper.get('url')) for paper in papers]
+        # Papers that share a PDF URL share one summary job.
+        for url in pdf_urls:
+            if url and PDF_RE.search(url) and url not in futures:
+                streams[url] = queue.Queue()
+                futures[url] = executor.submit(self._summarize_into, url, streams[url])
+        return pdf_urls
+
+    def _print_papers(self, papers: list, pdf_urls: list, streams: dict, futures: dict, drained: set):
+        """
+        Prints papers in order, streaming each summary as it is generated.
+        drained holds the URLs whose stream was already printed for an earlier paper.
+        """
         for i, paper in enumerate(papers):
             print(f"\n--- Paper {i+1}/{len(papers)} ---")
             print(f"Title: {paper.get('title', 'N/A')}")
@@ -117,11 +289,22 @@ class PaperScoutAgent:
             print(f"Published: {paper.get('published_date', 'N/A')}")
             print(f"URL: {paper.get('url', 'N/A')}")
 
-            pdf_url = paper.get('url')
-            if pdf_url and '.pdf' in pdf_url: # Basic check for PDF URL
-                print("AI Scout: Requesting PDF summary...")
-                summary = self.summarize_pdf(pdf_url)
-                print(f"AI Scout Summary:\n{summary}")
+            pdf_url = pdf_urls[i]
+            if pdf_url in drained:
+                # Each stream ends with a single sentinel, so repeats print the finished summary.
+                print(f"AI Scout Summary:\n{futures[pdf_url].result()}")
+            elif pdf_url in futures:
+                drained.add(pdf_url)
+                print("AI Scout Summary:")
+                streamed = []
+                for delta in iter(streams[pdf_url].get, None):
+                    streamed.append(delta)
+                    print(delta, end="", flush=True)
+                summary = futures[pdf_url].result()
+                if "".join(streamed).strip() != summary:
+                    # Nothing (or only part of the summary) was streamed, e.g. on failure
+                    print(f"\n{summary}" if streamed else summary, end="")
+                print()
             else:
                 print("AI Scout: No direct PDF URL found or URL is not a PDF. Cannot summarize.")
                 # Fallback to abstract if no PDF and if you want to use a LLM here.
@@ -141,23 +324,37 @@ def main():
 
     agent = PaperScoutAgent()
 
-    while True:
-        topic = input("\nEnter a research topic (e.g., 'causal inference in AI'): ").strip()
-        if topic.lower() in ['exit', 'quit']:
-            print("Exiting Paper Scout. Goodbye!")
-            break
+    try:
+        while True:
+            topic = input("\nEnter a research topic, or several separated by ';' (e.g., 'causal inference in AI'): ").strip()
+            if topic.lower() in ['exit', 'quit']:
+                print("Exiting Paper Scout. Goodbye!")
+                break
 
-        try:
-            num_papers_str = input("How many papers to scout? (default: 3): ").strip()
-            num_papers = int(num_papers_str) if num_papers_str else 3
-            if num_papers <= 0:
-                print("Please enter a positive number.")
+            topics = [t.strip() for t in topic.split(';') if t.strip()]
+            if not topics:
+                print("Please enter a research topic.")
+                continue
+            if len(topics) > MAX_BATCH_TOPICS:
+                print(f"Please enter at most {MAX_BATCH_TOPICS} topics at a time.")
                 continue
-        except ValueError:
-            print("Invalid number. Please enter a whole number.")
-            continue
 
-        agent.discover_and_summarize_papers(topic, num_papers)
+            try:
+                num_papers_str = input("How many papers to scout? (default: 3): ").strip()
+                num_papers = int(num_papers_str) if num_papers_str else 3
+                if num_papers <= 0:
+                    print("Please enter a positive number.")
+                    continue
+            except ValueError:
+                print("Invalid number. Please enter a whole number.")
+                continue
+
+            if len(topics) > 1:
+                agent.discover_and_summarize_topics(topics, num_papers)
+            else:
+                agent.discover_and_summarize_papers(topics[0], num_papers)
+    finally:
+        agent.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
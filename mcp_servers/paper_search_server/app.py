@@ -1,13 +1,23 @@
 # mcp_servers/paper_search_server/app.py
 
 from fastapi import FastAPI, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-import arxiv
+import asyncio
+import os
+import time
+import feedparser
+import httpx
+from cachetools import TTLCache
 
 app = FastAPI(
     title="Paper Search MCP Server",
-    description="Searches arXiv for recent research papers."
+    description="Searches arXiv for recent research papers.",
+    default_response_class=ORJSONResponse
 )
+# Compress larger JSON bodies, such as paper lists with full abstracts.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 class SearchRequest(BaseModel):
     query: str = Field(..., example="large language models")
@@ -20,6 +30,107 @@ class PaperResult(BaseModel):
     url: str
     published_date: str
 
+class BatchSearchResult(BaseModel):
+    papers: list[PaperResult] = []
+    error: str | None = Field(None, description="Set instead of papers when this query failed")
+
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+# arXiv occasionally answers with a 5xx or drops the connection; both succeed on retry.
+# Attempts, timeout and spacing together keep one uncached query (worst case about
+# 3 + 2 * 10 + 3 = 26s) inside the agent's 30s search timeout.
+ARXIV_MAX_ATTEMPTS = 2
+ARXIV_TIMEOUT = 10  # seconds per attempt
+# arXiv asks API clients to make at most one request every 3 seconds. All calls,
+# including retries and batched queries, go through one lock that enforces this.
+ARXIV_REQUEST_SPACING = 3  # seconds
+arxiv_lock = asyncio.Lock()
+last_arxiv_request = 0.0
+
+# Results for "recent papers" on a topic barely change within minutes, so hot
+# queries are served from memory; the short TTL keeps new submissions visible.
+SEARCH_CACHE_MAXSIZE = int(os.getenv("SEARCH_CACHE_MAXSIZE", "256"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "600"))  # seconds
+search_cache = TTLCache(maxsize=SEARCH_CACHE_MAXSIZE, ttl=SEARCH_CACHE_TTL)
+
+# Upper bound on queries per /search_papers_batch call. Uncached queries reach arXiv
+# one at a time, so each one adds at least ARXIV_REQUEST_SPACING seconds to the batch,
+# and any other search that arrives meanwhile waits behind them for arxiv_lock.
+MAX_BATCH_QUERIES = 10
+
+# --- HTTP Client Lifecycle ---
+
+@app.on_event("startup")
+async def startup():
+    # One pooled client per app so arXiv queries reuse keep-alive connections.
+    app.state.http = httpx.AsyncClient(timeout=ARXIV_TIMEOUT, follow_redirects=True)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.aclose()
+
+# --- Helper Functions ---
+
+def parse_arxiv_feed(content: bytes) -> list[PaperResult]:
+    """Parses an arXiv Atom feed into PaperResult models."""
+    feed = feedparser.parse(content)
+    papers = []
+    for entry in feed.entries:
+        papers.append(PaperResult(
+            title=" ".join(entry.title.split()),
+            authors=[author.name for author in entry.get("authors", [])],
+            summary=entry.summary,
+            url=entry.id,
+            published_date=time.strftime("%Y-%m-%d", entry.published_parsed)
+        ))
+    return papers
+
+async def arxiv_get(params: dict) -> httpx.Response:
+    """Sends a query to the arXiv API, waiting as needed to respect its request spacing."""
+    global last_arxiv_request
+    async with arxiv_lock:
+        wait = last_arxiv_request + ARXIV_REQUEST_SPACING - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            return await app.state.http.get(ARXIV_API_URL, params=params)
+        finally:
+            last_arxiv_request = time.monotonic()
+
+async def fetch_arxiv_papers(query: str, max_results: int) -> list[PaperResult]:
+    """Fetches the most recently submitted arXiv papers matching query, using the cache when possible."""
+    cache_key = (query, max_results)
+    papers = search_cache.get(cache_key)
+    if papers is not None:
+        return papers
+
+    for attempt in range(1, ARXIV_MAX_ATTEMPTS + 1):
+        try:
+            response = await arxiv_get({
+                "search_query": query,
+                "sortBy": "submittedDate",
+                "sortOrder": "descending",
+                "max_results": max_results
+            })
+        except httpx.TransportError:
+            if attempt < ARXIV_MAX_ATTEMPTS:
+                continue
+            raise
+        if response.status_code >= 500 and attempt < ARXIV_MAX_ATTEMPTS:
+            continue
+        break
+    response.raise_for_status()
+
+    # feedparser is pure Python; parse in a worker thread to keep the event loop free.
+    # An empty feed means nothing matched, so it is cached like any other result.
+    papers = await asyncio.to_thread(parse_arxiv_feed, response.content)
+    search_cache[cache_key] = papers
+    return papers
+
+def normalize_query(query: str) -> str:
+    """Collapses whitespace so trivially different spellings share a cache entry."""
+    # Case is preserved because arXiv's AND/OR/ANDNOT operators are case-sensitive.
+    return " ".join(query.split())
+
 @app.post("/search_papers", response_model=list[PaperResult])
 async def search_papers(request: SearchRequest):
     """
@@ -27,26 +138,34 @@ async def search_papers(request: SearchRequest):
     Returns a list of paper details.
     """
     try:
-        search = arxiv.Search(
-            query=request.query,
-            max_results=request.max_results,
-            sort_by=arxiv.SortCriterion.SubmittedDate,
-            sort_order=arxiv.SortOrder.Descending
-        )
-        papers = []
-        for result in search.results():
-            papers.append(PaperResult(
-                title=result.title,
-                authors=[author.name for author in result.authors],
-                summary=result.summary,
-                url=result.entry_id,
-                published_date=result.published.strftime("%Y-%m-%d")
-            ))
-        return papers
+        return await fetch_arxiv_papers(normalize_query(request.query), request.max_results)
     except Exception as e:
         print(f"Error searching arXiv: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to search arXiv: {e}")
 
+@app.post("/search_papers_batch", response_model=list[BatchSearchResult])
+async def search_papers_batch(batch: list[SearchRequest]):
+    """
+    Runs several searches in one call, returning one result per request, in
+    request order. Cached queries return immediately; the rest are sent to arXiv
+    one at a time. A failed query sets that result's error and leaves the others intact.
+    """
+    if len(batch) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries are allowed per batch.")
+    outcomes = await asyncio.gather(*(
+        fetch_arxiv_papers(normalize_query(request.query), request.max_results)
+        for request in batch
+    ), return_exceptions=True)
+
+    results = []
+    for request, outcome in zip(batch, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"Error searching arXiv for '{request.query}': {outcome}")
+            results.append(BatchSearchResult(error=f"Failed to search arXiv: {outcome}"))
+        else:
+            results.append(BatchSearchResult(papers=outcome))
+    return results
+
 if __name__ == "__main__":
     import uvicorn
     # This will run the server on http://127.0.0.1:8000
@@ -1,26 +1,39 @@
 # mcp_servers/pdf_summarize_server/app.py
 
 from fastapi import FastAPI, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, HttpUrl
-import requests
-import PyPDF2
-from io import BytesIO
+import asyncio
+import hashlib
+import io
+import orjson
+import httpx
+from cachetools import TTLCache
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
+from pdf_extract import extract_text_from_pdf
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(
     title="PDF Summarize MCP Server",
-    description="Downloads a PDF, extracts text, and summarizes using a configurable cloud LLM."
+    description="Downloads a PDF, extracts text, and summarizes using a configurable cloud LLM.",
+    default_response_class=ORJSONResponse
 )
+# Compress larger JSON bodies. text/event-stream responses are left alone so summaries still stream.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 class SummarizeRequest(BaseModel):
     pdf_url: HttpUrl = Field(..., description="URL of the PDF to summarize")
 
 class SummarizeResponse(BaseModel):
     summary: str
+    cached: bool = False
 
 # --- LLM Client Initialization (based on environment variable) ---
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
@@ -41,8 +54,7 @@ if LLM_PROVIDER == "openai":
     else:
         try:
             import openai
-            openai.api_key = OPENAI_API_KEY
-            llm_client = openai
+            llm_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
             llm_model = OPENAI_MODEL_NAME
             print(f"Using OpenAI model: {llm_model}")
         except ImportError:
@@ -53,7 +65,7 @@ elif LLM_PROVIDER == "anthropic":
     else:
         try:
             import anthropic
-            llm_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+            llm_client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
             llm_model = ANTHROPIC_MODEL_NAME
             print(f"Using Anthropic model: {llm_model}")
         except ImportError:
@@ -65,86 +77,226 @@ elif LLM_PROVIDER == "google":
         try:
             import google.generativeai as genai
             genai.configure(api_key=GOOGLE_API_KEY)
-            llm_client = genai
             llm_model = GOOGLE_MODEL_NAME
+            # Build the model once; it owns its own transport and is reused across requests.
+            llm_client = genai.GenerativeModel(llm_model)
             print(f"Using Google Generative AI model: {llm_model}")
         except ImportError:
             print("Warning: 'google-generativeai' library not installed. Cannot use Google LLM.")
 else:
     print(f"Unsupported LLM_PROVIDER specified: {LLM_PROVIDER}. LLM summarization will be unavailable.")
 
+# --- Prompt Budget ---
+# Only the first MAX_INPUT_TOKENS tokens of a paper are sent to the LLM. This keeps
+# requests inside the model's context window and bounds prefill latency and cost.
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "12000"))
+CHARS_PER_TOKEN = 4  # Rough fallback when no tokenizer is available
+
+tokenizer = None
+try:
+    import tiktoken
+    try:
+        tokenizer = tiktoken.encoding_for_model(llm_model or "")
+    except KeyError:
+        # Unknown (or non-OpenAI) model: cl100k_base is a close enough approximation
+        tokenizer = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    print(f"Warning: 'tiktoken' library not installed. Estimating tokens as {CHARS_PER_TOKEN} characters each.")
+except Exception as e:
+    # tiktoken downloads its encodings on first use, which fails when offline
+    print(f"Warning: could not load a tiktoken encoding ({e}). Estimating tokens as {CHARS_PER_TOKEN} characters each.")
+
+# --- PDF Processing Limits ---
+# Text extraction is CPU-bound, so it runs in a pool of worker processes.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(100 * 1024 * 1024)))
+
+# --- Summary Cache ---
+# PDF text and its summary are deterministic for a given URL, so repeat requests
+# are answered from memory instead of re-downloading and re-summarizing.
+SUMMARY_CACHE_MAXSIZE = int(os.getenv("SUMMARY_CACHE_MAXSIZE", "512"))
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", "86400"))  # seconds
+summary_cache = TTLCache(maxsize=SUMMARY_CACHE_MAXSIZE, ttl=SUMMARY_CACHE_TTL)
+cache_stats = {"hits": 0, "misses": 0}
+
+# Extracted text is also cached by a hash of the PDF bytes, so the same paper served
+# from a different URL (mirrors, redirects, versioned links) skips re-parsing.
+TEXT_CACHE_MAXSIZE = int(os.getenv("TEXT_CACHE_MAXSIZE", "256"))
+TEXT_CACHE_TTL = int(os.getenv("TEXT_CACHE_TTL", str(7 * 86400)))  # seconds
+text_cache = TTLCache(maxsize=TEXT_CACHE_MAXSIZE, ttl=TEXT_CACHE_TTL)
+
+# --- HTTP Client and Worker Pool Lifecycle ---
+
+def create_pdf_pool() -> ProcessPoolExecutor:
+    """Creates the PDF extraction pool."""
+    # Workers are started lazily from inside the running event loop, which already owns
+    # other threads; forking that process can deadlock, so workers are spawned fresh.
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+@app.on_event("startup")
+async def startup():
+    # One pooled client per app so PDF downloads reuse keep-alive connections.
+    app.state.http = httpx.AsyncClient(
+        timeout=10,
+        follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
+    app.state.pool = create_pdf_pool()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.aclose()
+    app.state.pool.shutdown()
+
 # --- Helper Functions ---
 
-def download_pdf(url: str) -> BytesIO:
-    """Downloads a PDF from a URL and returns it as a BytesIO object."""
+async def download_pdf(url: str) -> bytes:
+    """Streams a PDF from a URL and returns its raw bytes."""
     try:
-        response = requests.get(url, stream=True, timeout=10)
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        # Check content type to ensure it's a PDF
-        if 'application/pdf' not in response.headers.get('Content-Type', ''):
-            raise ValueError(f"URL does not point to a PDF: {response.headers.get('Content-Type')}")
-
-        pdf_content = BytesIO(response.content)
-        return pdf_content
-    except requests.exceptions.RequestException as e:
+        async with app.state.http.stream("GET", url) as response:
+            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+            # Check content type to ensure it's a PDF
+            if 'application/pdf' not in response.headers.get('Content-Type', ''):
+                raise ValueError(f"URL does not point to a PDF: {response.headers.get('Content-Type')}")
+            # Reject oversized PDFs before reading the body when the server tells us the size
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > MAX_PDF_BYTES:
+                raise ValueError(f"PDF is too large ({content_length} bytes, limit {MAX_PDF_BYTES}).")
+
+            # Write into one growing buffer; getvalue() hands that buffer back as bytes
+            # without copying, so the PDF is never held twice in memory.
+            buffer = io.BytesIO()
+            async for chunk in response.aiter_bytes():
+                if buffer.tell() + len(chunk) > MAX_PDF_BYTES:
+                    raise ValueError(f"PDF exceeds the {MAX_PDF_BYTES} byte download limit.")
+                buffer.write(chunk)
+
+        return buffer.getvalue()
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=400, detail=f"Failed to download PDF from URL: {url} - {e}")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-def extract_text_from_pdf(pdf_file: BytesIO) -> str:
-    """Extracts text from a PDF BytesIO object."""
-    try:
-        reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or "" # Handle pages with no extractable text
+def truncate_to_token_budget(text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+    """Returns the leading part of text that fits within max_tokens."""
+    # Every token spans at least one character, so short texts need no tokenizing.
+    if len(text) <= max_tokens:
         return text
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to extract text from PDF: {e}")
+    if tokenizer is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = tokenizer.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return tokenizer.decode(tokens[:max_tokens])
 
-def summarize_text_with_llm(text: str) -> str:
-    """Summarizes text using the configured LLM client."""
+def build_summary_prompt(text: str) -> str:
+    """Builds the summarization prompt from (token-budgeted) paper text."""
+    text = truncate_to_token_budget(text)
+    return f"Summarize the following research paper content in a concise manner (max 200 words), highlighting its main objectives, methods, and key findings:\n\n{text}"
+
+async def stream_text_with_llm(text: str):
+    """Summarizes text using the configured LLM client, yielding the summary in chunks as it is generated."""
     if not llm_client:
-        return "LLM summarization is not configured or failed to initialize."
+        yield "LLM summarization is not configured or failed to initialize."
+        return
     if not text.strip():
-        return "No text provided for summarization."
+        yield "No text provided for summarization."
+        return
 
-    prompt = f"Summarize the following research paper content in a concise manner (max 200 words), highlighting its main objectives, methods, and key findings:\n\n{text}"
+    # Tokenizing a whole paper takes a while; keep it off the event loop.
+    prompt = await asyncio.to_thread(build_summary_prompt, text)
+
+    if LLM_PROVIDER == "openai":
+        stream = await llm_client.chat.completions.create(
+            model=llm_model,
+            messages=[
+                {"role": "system", "content": "You are a research paper summarizer."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=250, # Adjust based on desired summary length and model context window
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    elif LLM_PROVIDER == "anthropic":
+        async with llm_client.messages.stream(
+            model=llm_model,
+            max_tokens=250,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1
+        ) as stream:
+            async for delta in stream.text_stream:
+                yield delta
+    elif LLM_PROVIDER == "google":
+        response = await llm_client.generate_content_async(
+            prompt,
+            generation_config=genai.types.GenerationConfig(temperature=0.1, max_output_tokens=250),
+            stream=True
+        )
+        async for chunk in response:
+            yield chunk.text
+    else:
+        yield "Unsupported LLM provider."
 
+async def summarize_text_with_llm(text: str) -> str:
+    """Summarizes text using the configured LLM client."""
+    # Built on the streaming path so each provider's request is defined in one place.
     try:
-        if LLM_PROVIDER == "openai":
-            response = llm_client.chat.completions.create(
-                model=llm_model,
-                messages=[
-                    {"role": "system", "content": "You are a research paper summarizer."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=250 # Adjust based on desired summary length and model context window
-            )
-            return response.choices[0].message.content.strip()
-        elif LLM_PROVIDER == "anthropic":
-            response = llm_client.messages.create(
-                model=llm_model,
-                max_tokens=250,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
-            )
-            return response.content[0].text.strip()
-        elif LLM_PROVIDER == "google":
-            model = llm_client.GenerativeModel(llm_model)
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(temperature=0.1, max_output_tokens=250)
-            )
-            return response.text.strip()
-        else:
-            return "Unsupported LLM provider."
+        parts = [delta async for delta in stream_text_with_llm(text)]
     except Exception as e:
         print(f"Error during LLM summarization with {LLM_PROVIDER}: {e}")
         raise HTTPException(status_code=500, detail=f"LLM summarization failed: {e}. Check API key and model availability.")
+    return "".join(parts).strip()
+
+def sse_event(payload: dict) -> str:
+    """Formats a payload as a Server-Sent Events data line."""
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+def get_cached_summary(cache_key: str) -> str | None:
+    """Looks up a summary in the cache and records the hit or miss."""
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        cache_stats["hits"] += 1
+        print(f"Summary cache hit (hits={cache_stats['hits']}, misses={cache_stats['misses']})")
+    else:
+        cache_stats["misses"] += 1
+    return cached_summary
+
+def pdf_digest(pdf_bytes: bytes) -> str:
+    """Returns a content hash of the PDF bytes, used as the text cache key."""
+    return hashlib.blake2b(pdf_bytes, digest_size=32).hexdigest()
+
+async def load_pdf_text(pdf_url: str) -> str:
+    """Downloads a PDF and extracts its text, reusing earlier extractions of identical content."""
+    pdf_bytes = await download_pdf(pdf_url)
+    # hashlib releases the GIL on large inputs, so hashing in a thread keeps the loop responsive.
+    digest = await asyncio.to_thread(pdf_digest, pdf_bytes)
+    cached_text = text_cache.get(digest)
+    if cached_text is not None:
+        print(f"Extracted text cache hit for PDF {digest[:12]}")
+        return cached_text
+
+    pool = app.state.pool
+    try:
+        # PDF parsing is CPU-bound; run it in a worker process to use all cores.
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(pool, extract_text_from_pdf, pdf_bytes)
+    except BrokenProcessPool:
+        # A worker died (e.g. PDFium crashed on a malformed PDF), which breaks the whole pool.
+        # Replace it once, so requests after this one can still be served.
+        if app.state.pool is pool:
+            print("PDF extraction worker crashed; restarting the worker pool.")
+            app.state.pool = create_pdf_pool()
+            pool.shutdown(wait=False)
+        raise HTTPException(status_code=500, detail="Failed to extract text from PDF: the extraction worker crashed.")
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to extract text from PDF: {e}")
+    text_cache[digest] = text
+    return text
 
 @app.post("/summarize_pdf", response_model=SummarizeResponse)
 async def summarize_pdf(request: SummarizeRequest):
@@ -153,16 +305,66 @@ async def summarize_pdf(request: SummarizeRequest):
     and provides an LLM-generated summary.
     """
     print(f"Received request to summarize PDF: {request.pdf_url}")
-    pdf_file_content = download_pdf(str(request.pdf_url))
-    extracted_text = extract_text_from_pdf(pdf_file_content)
+    cache_key = str(request.pdf_url)
+    cached_summary = get_cached_summary(cache_key)
+    if cached_summary is not None:
+        return SummarizeResponse(summary=cached_summary, cached=True)
+
+    extracted_text = await load_pdf_text(str(request.pdf_url))
 
     if not extracted_text.strip():
         # If the PDF is empty or text extraction failed for some reason
         return SummarizeResponse(summary="Could not extract readable text from PDF for summarization.")
 
-    summary = summarize_text_with_llm(extracted_text)
+    summary = await summarize_text_with_llm(extracted_text)
+    if llm_client and summary:
+        # Don't cache the placeholder returned when no LLM is configured, or an empty answer.
+        summary_cache[cache_key] = summary
     return SummarizeResponse(summary=summary)
 
+@app.post("/summarize_pdf_stream")
+async def summarize_pdf_stream(request: SummarizeRequest):
+    """
+    Same as /summarize_pdf, but streams the summary as Server-Sent Events.
+    Emits {"delta": ...} events while the LLM generates, then a final
+    {"done": true, "cached": ...} event, or an {"error": ...} event on failure.
+    """
+    print(f"Received request to stream PDF summary: {request.pdf_url}")
+    cache_key = str(request.pdf_url)
+    cached_summary = get_cached_summary(cache_key)
+    if cached_summary is not None:
+        async def cached_events():
+            yield sse_event({"delta": cached_summary})
+            yield sse_event({"done": True, "cached": True})
+        return StreamingResponse(cached_events(), media_type="text/event-stream")
+
+    # Download and extraction errors surface as regular HTTP errors before streaming starts.
+    extracted_text = await load_pdf_text(str(request.pdf_url))
+
+    async def summary_events():
+        if not extracted_text.strip():
+            yield sse_event({"delta": "Could not extract readable text from PDF for summarization."})
+            yield sse_event({"done": True, "cached": False})
+            return
+
+        parts = []
+        try:
+            async for delta in stream_text_with_llm(extracted_text):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except Exception as e:
+            print(f"Error during LLM summarization with {LLM_PROVIDER}: {e}")
+            yield sse_event({"error": f"LLM summarization failed: {e}. Check API key and model availability."})
+            return
+
+        summary = "".join(parts).strip()
+        if llm_client and summary:
+            # Don't cache the placeholder returned when no LLM is configured, or an empty answer.
+            summary_cache[cache_key] = summary
+        yield sse_event({"done": True, "cached": False})
+
+    return StreamingResponse(summary_events(), media_type="text/event-stream")
+
 if __name__ == "__main__":
     import uvicorn
     # This will run the server on http://127.0.0.1:8001
@@ -0,0 +1,27 @@
+# mcp_servers/pdf_summarize_server/pdf_extract.py
+
+# Runs inside the extraction worker processes. Spawned workers import this module
+# to unpickle the task, so it deliberately imports nothing beyond pypdfium2: no
+# server app, LLM clients or tokenizer are built per worker.
+import pypdfium2 as pdfium
+
+def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+    """
+    Extracts text from raw PDF bytes.
+    Runs in a worker process, so failures are raised as plain RuntimeErrors
+    that survive pickling back to the server process.
+    """
+    try:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            pages_text = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                pages_text.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            return "\n".join(pages_text)
+        finally:
+            pdf.close()
+    except Exception as e:
+        raise RuntimeError(str(e)) from None